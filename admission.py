@@ -0,0 +1,187 @@
+# admission.py - LeadBoost
+# Control de admisión para operaciones pesadas (subidas, análisis, exportaciones, enriquecimiento).
+# Limita los trabajos concurrentes por usuario y globales, y reparte los huecos libres
+# con round-robin ponderado entre planes (premium recibe más huecos que freemium) y
+# round-robin entre usuarios del mismo plan, para que nadie acapare el proceso.
+import threading
+import itertools
+from collections import deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+MAX_HEAVY_GLOBAL = 2
+MAX_HEAVY_PER_USER = 1
+# Las operaciones largas (subida, enriquecimiento) adquieren un hueco por lote de filas
+HEAVY_CHUNK_ROWS = 50
+# profiles.role -> clase de plan
+PLAN_TIERS = {"premium": "premium", "admin": "premium", "freemium": "freemium"}
+# Huecos libres que recibe cada clase por ronda cuando ambas tienen trabajos en cola
+PLAN_WEIGHTS = {"premium": 2, "freemium": 1}
+POLL_SECONDS = 0.5
+
+
+class Ticket:
+    def __init__(self, seq, user_id, role, kind):
+        self.seq = seq
+        self.user_id = user_id
+        self.tier = PLAN_TIERS.get((role or "freemium").lower(), "freemium")
+        self.kind = kind
+        self.granted = False
+        self.released = False
+
+
+class AdmissionController:
+    def __init__(self, max_global=MAX_HEAVY_GLOBAL, max_per_user=MAX_HEAVY_PER_USER):
+        self.max_global = max_global
+        self.max_per_user = max_per_user
+        self._cond = threading.Condition()
+        self._seq = itertools.count(1)
+        self._queues = {}        # user_id -> deque[Ticket]
+        self._users = {tier: deque() for tier in PLAN_WEIGHTS}  # usuarios en cola por plan, en orden de turno
+        self._tiers = deque(PLAN_WEIGHTS)                        # orden de turno entre planes
+        self._credits = dict(PLAN_WEIGHTS)                       # huecos que le quedan a cada plan en la ronda
+        self._running = {}       # user_id -> trabajos en ejecución
+        self._active = deque()   # tickets en ejecución, en orden de entrada
+        self._total = 0
+
+    # --- API pública ---
+    def enqueue(self, user_id, role, kind):
+        with self._cond:
+            t = Ticket(next(self._seq), user_id, role, kind)
+            if user_id not in self._queues:
+                self._queues[user_id] = deque()
+                self._users[t.tier].append(user_id)
+            self._queues[user_id].append(t)
+            self._dispatch()
+            return t
+
+    def wait(self, ticket, timeout=None):
+        with self._cond:
+            if not ticket.granted:
+                self._cond.wait(timeout)
+            return ticket.granted
+
+    def release(self, ticket):
+        with self._cond:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket.granted:
+                self._active.remove(ticket)
+                self._running[ticket.user_id] -= 1
+                if not self._running[ticket.user_id]:
+                    del self._running[ticket.user_id]
+                self._total -= 1
+            else:
+                q = self._queues.get(ticket.user_id)
+                if q is not None and ticket in q:
+                    q.remove(ticket)
+                    if not q:
+                        del self._queues[ticket.user_id]
+                        for us in self._users.values():
+                            if ticket.user_id in us:
+                                us.remove(ticket.user_id)
+            self._dispatch()
+
+    def position(self, ticket):
+        """Posición estimada en la cola (1 = el siguiente en entrar)."""
+        with self._cond:
+            if ticket.granted:
+                return 0
+            queues = {u: deque(q) for u, q in self._queues.items()}
+            users = {tier: deque(us) for tier, us in self._users.items()}
+            tiers = deque(self._tiers)
+            credits = dict(self._credits)
+            running = dict(self._running)
+            # Simulación del despacho real, suponiendo que los trabajos terminan en orden de entrada
+            active = deque(t.user_id for t in self._active)
+            pos = 0
+            while queues:
+                t = None
+                if len(active) < self.max_global:
+                    t = next(self._schedule(queues, users, tiers, credits, running), None)
+                if t is None:
+                    if not active:
+                        break
+                    done = active.popleft()
+                    running[done] -= 1
+                    continue
+                pos += 1
+                if t is ticket:
+                    return pos
+                active.append(t.user_id)
+            return pos + 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                "running": self._total,
+                "queued": sum(len(q) for q in self._queues.values()),
+            }
+
+    # --- Planificación interna (con el lock tomado) ---
+    def _schedule(self, queues, users, tiers, credits, running):
+        """Genera tickets en orden: round-robin ponderado entre planes y round-robin
+        entre usuarios del mismo plan. Muta las estructuras recibidas."""
+        while queues:
+            picked = None
+            for tier in tiers:
+                # Los usuarios en su límite se saltan sin perder su sitio en la ronda
+                picked = next((u for u in users[tier] if running.get(u, 0) < self.max_per_user), None)
+                if picked is not None:
+                    break
+            if picked is None:
+                return
+            t = queues[picked].popleft()
+            users[tier].remove(picked)
+            if queues[picked]:
+                users[tier].append(picked)
+            else:
+                del queues[picked]
+            credits[tier] -= 1
+            if credits[tier] <= 0:
+                credits[tier] = PLAN_WEIGHTS[tier]
+                tiers.remove(tier)
+                tiers.append(tier)
+            running[picked] = running.get(picked, 0) + 1
+            yield t
+
+    def _dispatch(self):
+        if self._total >= self.max_global:
+            return
+        granted = False
+        for t in self._schedule(self._queues, self._users, self._tiers, self._credits, self._running):
+            t.granted = True
+            self._active.append(t)
+            self._total += 1
+            granted = True
+            if self._total >= self.max_global:
+                break
+        if granted:
+            self._cond.notify_all()
+
+
+@st.cache_resource
+def get_admission_controller():
+    # Compartido entre todas las sesiones del proceso de Streamlit
+    return AdmissionController()
+
+
+@contextmanager
+def heavy_job(user_id, role, kind, placeholder=None):
+    """Espera turno para una operación pesada mostrando la posición en cola.
+
+    user_id debe ser el id de la sesión (session.user.id); las operaciones largas
+    deben llamarlo una vez por lote de HEAVY_CHUNK_ROWS filas, reutilizando placeholder.
+    """
+    ctl = get_admission_controller()
+    ticket = ctl.enqueue(user_id, role, kind)
+    placeholder = placeholder or st.empty()
+    try:
+        while not ctl.wait(ticket, timeout=POLL_SECONDS):
+            placeholder.info(f"⏳ En cola ({kind}): posición {ctl.position(ticket)}. Hay otras operaciones en curso...")
+        placeholder.empty()
+        yield
+    finally:
+        ctl.release(ticket)
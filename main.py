@@ -7,6 +7,7 @@ import io
 import altair as alt
 from supabase import create_client, Client
 from datetime import datetime
+from admission import heavy_job, HEAVY_CHUNK_ROWS
 
 # -----------------------
 # Config
@@ -110,6 +111,77 @@ def insert_lead_rpc(authed, email, company, position, verified, source_list):
     except Exception as e:
         return False, str(e)
 
+EXISTING_EMAILS_BATCH = 200
+
+def fetch_existing_emails(authed, user_id, emails):
+    """Devuelve (emails ya guardados entre los dados, error). Consulta por lotes con in_."""
+    emails = list(emails)
+    found = set()
+    try:
+        for i in range(0, len(emails), EXISTING_EMAILS_BATCH):
+            chunk = emails[i:i + EXISTING_EMAILS_BATCH]
+            res = authed.table("leads").select("email").eq("user_id", user_id).in_("email", chunk).execute()
+            found.update((r.get("email") or "").strip().lower() for r in (res.data or []))
+        return found, None
+    except Exception as e:
+        return None, str(e)
+
+# -----------------------
+# Dry-run (pre-flight) de subida
+# -----------------------
+DEFAULT_SECONDS_PER_INSERT = 0.25
+
+def preflight_upload(authed, user_id, df):
+    """Valida el CSV sin escribir nada. Devuelve (report, error)."""
+    fresh = fetch_profile(authed, user_id)
+    if not fresh:
+        return None, "No se pudo leer tu cuota; el dry-run no puede calcular qué filas caben."
+    used_q = int(fresh.get("used_quota", 0))
+    monthly_q = int(fresh.get("monthly_quota", 25))
+    remaining = max(monthly_q - used_q, 0)
+
+    seen = set()
+    invalid, duplicates, over_quota = [], [], []
+    candidates = []
+    attempted = 0  # filas para las que la subida real llamará a la RPC
+    for idx, row in df.iterrows():
+        e = str(row.get("email", "")).strip().lower()
+        if not is_valid_email(e):
+            invalid.append(f"Fila {idx+1}: email inválido ({e})")
+            continue
+        attempted += 1
+        if e in seen:
+            duplicates.append(f"Fila {idx+1}: duplicado en el CSV ({e})")
+            continue
+        seen.add(e)
+        candidates.append((idx, e))
+
+    existing, err = fetch_existing_emails(authed, user_id, seen)
+    if err:
+        return None, f"No se pudieron comprobar los leads existentes: {err}"
+
+    valid = 0
+    for idx, e in candidates:
+        if e in existing:
+            duplicates.append(f"Fila {idx+1}: ya existe en tus leads ({e})")
+            continue
+        valid += 1
+        if valid > remaining:
+            over_quota.append(f"Fila {idx+1}: excede la cuota ({e})")
+
+    per_insert = st.session_state.get("seconds_per_insert", DEFAULT_SECONDS_PER_INSERT)
+    return {
+        "total": len(df),
+        "valid": valid,
+        "invalid": invalid,
+        "duplicates": duplicates,
+        "over_quota": over_quota,
+        "remaining_quota": remaining,
+        "fits": min(valid, remaining),
+        "attempted": attempted,
+        "estimated_seconds": attempted * per_insert,
+    }, None
+
 # -----------------------
 # CSV ejemplo
 # -----------------------
@@ -179,6 +251,7 @@ if st.session_state.session is None:
 authed = get_authed_client()
 user_id = st.session_state.session.user.id
 profile = fetch_profile(authed, user_id) or {}
+role = profile.get("role", "freemium")
 
 st.sidebar.success(f"Conectado: {st.session_state.session.user.email}")
 if st.sidebar.button("Cerrar sesión"):
@@ -229,7 +302,8 @@ if menu == "Main":
 # -----------------------
 elif menu == "Análisis":
     st.header("📈 Análisis de Leads")
-    leads = authed.table("leads").select("*").eq("user_id", user_id).execute().data or []
+    with heavy_job(user_id, role, "análisis"):
+        leads = authed.table("leads").select("*").eq("user_id", user_id).execute().data or []
     if not leads:
         st.info("No hay leads para analizar.")
     else:
@@ -295,25 +369,57 @@ elif menu == "Upload":
             st.stop()
         st.subheader("Preview (primeras 10 filas)")
         st.dataframe(df.head(10))
+        if st.button("🔍 Simular subida (dry-run)"):
+            with heavy_job(user_id, role, "dry-run"):
+                report, err = preflight_upload(authed, user_id, df)
+            if err:
+                st.error(err)
+            else:
+                st.subheader("Resultado del dry-run (no se ha escrito nada)")
+                c1, c2, c3, c4 = st.columns(4)
+                c1.metric("Válidos", report["valid"])
+                c2.metric("Inválidos", len(report["invalid"]))
+                c3.metric("Duplicados", len(report["duplicates"]))
+                c4.metric("Caben en cuota", f"{report['fits']}/{report['remaining_quota']}")
+                st.write(f"Tiempo estimado de inserción: **{report['estimated_seconds']:.1f} s** ({report['attempted']} filas enviadas, {report['fits']} caben en cuota).")
+                for title, rows in (("Emails inválidos", report["invalid"]),
+                                    ("Duplicados", report["duplicates"]),
+                                    ("Fuera de cuota", report["over_quota"])):
+                    if rows:
+                        st.warning(f"{title}: {len(rows)}")
+                        for r in rows[:20]:
+                            st.text(r)
         if st.button("📥 Insertar todos los leads"):
             inserted = 0
+            attempted = 0
             errors = []
-            for idx, row in df.iterrows():
-                e = str(row.get("email", "")).strip().lower()
-                if not is_valid_email(e):
-                    errors.append(f"Fila {idx+1}: email inválido ({e})")
-                    continue
-                company = str(row.get("company", "")).strip()
-                name = str(row.get("contact_name", "")).strip()
-                phone = str(row.get("phone", "")).strip() if "phone" in row else ""
-                source = row.get("source", "CSV")
-                source_list = [source.strip()] if isinstance(source, str) and source.strip() else ["CSV"]
-                verified = row.get("verified", "unknown")
-                ok, res = insert_lead_rpc(authed, e, company, name, verified, source_list)
-                if ok:
-                    inserted += 1
-                else:
-                    errors.append(f"Fila {idx+1}: {res}")
+            elapsed = 0.0
+            rows = list(df.iterrows())
+            queue_box = st.empty()
+            # Un hueco de admisión por lote para no bloquear a otras sesiones durante toda la subida
+            for start in range(0, len(rows), HEAVY_CHUNK_ROWS):
+                with heavy_job(user_id, role, "subida", placeholder=queue_box):
+                    started = datetime.utcnow()
+                    for idx, row in rows[start:start + HEAVY_CHUNK_ROWS]:
+                        e = str(row.get("email", "")).strip().lower()
+                        if not is_valid_email(e):
+                            errors.append(f"Fila {idx+1}: email inválido ({e})")
+                            continue
+                        company = str(row.get("company", "")).strip()
+                        name = str(row.get("contact_name", "")).strip()
+                        phone = str(row.get("phone", "")).strip() if "phone" in row else ""
+                        source = row.get("source", "CSV")
+                        source_list = [source.strip()] if isinstance(source, str) and source.strip() else ["CSV"]
+                        verified = row.get("verified", "unknown")
+                        attempted += 1
+                        ok, res = insert_lead_rpc(authed, e, company, name, verified, source_list)
+                        if ok:
+                            inserted += 1
+                        else:
+                            errors.append(f"Fila {idx+1}: {res}")
+                    elapsed += (datetime.utcnow() - started).total_seconds()
+            if attempted:
+                st.session_state.seconds_per_insert = elapsed / attempted
             log_action(user_id, "bulk_insert", {"inserted": inserted, "errors": len(errors)})
             st.success(f"Leads insertados: {inserted}")
             if errors:
@@ -1,11 +1,22 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from utils import load_leads
+from utils import load_leads, get_role
+from admission import heavy_job
 
 st.title("Análisis Avanzado de Leads")
 
-leads = load_leads()
+session = st.session_state.get("session")
+if session is None:
+    st.info("Inicia sesión para ver el análisis")
+    st.stop()
+user_id = session.user.id
+role, err = get_role(session)
+if err:
+    st.warning(f"No se pudo leer tu plan ({err}); el análisis se programa como freemium.")
+    role = "freemium"
+with heavy_job(user_id, role, "análisis"):
+    leads = load_leads()
 if not leads.empty:
     filtro_empresa = st.selectbox("Filtrar por empresa", ["Todas"] + list(leads['company'].dropna().unique()))
     if filtro_empresa != "Todas":
@@ -14,6 +25,10 @@ if not leads.empty:
     fig = px.bar(leads.groupby("title").size().reset_index(name="count"), x="title", y="count", title="Leads por Cargo")
     st.plotly_chart(fig)
 
-    st.download_button("Exportar CSV", leads.to_csv(index=False), "leads.csv")
+    # El CSV solo se genera cuando se pide, para no ocupar un hueco en cada rerun
+    if st.button("Exportar CSV"):
+        with heavy_job(user_id, role, "exportación"):
+            export_csv = leads.to_csv(index=False)
+        st.download_button("⬇️ Descargar CSV", export_csv, "leads.csv")
 else:
     st.info("No hay datos para analizar")
@@ -1,19 +1,37 @@
 import streamlit as st
 import pandas as pd
-from utils import enrich_email, update_quota, supabase
+from utils import enrich_email, update_quota, get_role, supabase
+from admission import heavy_job, HEAVY_CHUNK_ROWS
 
 def show_upload(user_email):
     st.header("Subida de Leads")
     uploaded_file = st.file_uploader("Sube tu CSV de emails", type="csv")
     if uploaded_file:
+        session = st.session_state.get("session")
+        if session is None:
+            st.warning("Inicia sesión para subir leads")
+            return
+        user_id = session.user.id
+        role, err = get_role(session)
+        if err:
+            st.warning(f"No se pudo leer tu plan ({err}); la subida se programa como freemium.")
+            role = "freemium"
         df = pd.read_csv(uploaded_file)
         enriched_data = []
-        for index, row in df.iterrows():
-            if update_quota(user_email, 1) is not None:
-                enriched = enrich_email(row['email'])
-                enriched_data.append(enriched)
-                supabase.table("leads").insert(enriched).execute()
-            else:
-                st.warning("Has alcanzado tu cuota mensual")
+        rows = list(df.iterrows())
+        queue_box = st.empty()
+        quota_reached = False
+        for start in range(0, len(rows), HEAVY_CHUNK_ROWS):
+            with heavy_job(user_id, role, "enriquecimiento", placeholder=queue_box):
+                for index, row in rows[start:start + HEAVY_CHUNK_ROWS]:
+                    if update_quota(user_email, 1) is not None:
+                        enriched = enrich_email(row['email'])
+                        enriched_data.append(enriched)
+                        supabase.table("leads").insert(enriched).execute()
+                    else:
+                        st.warning("Has alcanzado tu cuota mensual")
+                        quota_reached = True
+                        break
+            if quota_reached:
                 break
         st.write(pd.DataFrame(enriched_data))
@@ -40,3 +40,13 @@ def update_quota(email, increment=1):
         supabase.table("users").update({"quota": new_quota}).eq("email", email).execute()
         return new_quota
     return None
+
+def get_role(session):
+    """Devuelve (role, error) leyendo profiles con el token de la sesión (RLS)."""
+    try:
+        authed = create_client(SUPABASE_URL, SUPABASE_KEY)
+        authed.postgrest.auth(session.access_token)
+        profile = authed.table("profiles").select("role").eq("id", session.user.id).single().execute()
+        return (profile.data or {}).get("role", "freemium"), None
+    except Exception as e:
+        return None, str(e)